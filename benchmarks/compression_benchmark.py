@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""Benchmark FileCompressor across archive formats, levels, threads and volumes.
+
+Generates synthetic corpora (video-like incompressible data, many small text
+files and a mix of both), runs every configuration of the matrix through
+FileCompressor.compress_folder in its own worker process and reports MB/s,
+compression ratio, compressor CPU seconds and peak RSS as a table and JSON.
+
+p7zip has no zstd codec, so the "tar+zstd" format pipes tar into the zstd CLI
+at the same levels and thread counts as a comparison point.
+
+    python3 benchmarks/compression_benchmark.py --scale-mb 256 --json bench.json
+"""
+
+import os
+import sys
+import glob
+import json
+import random
+import shutil
+import argparse
+import tempfile
+import resource
+import itertools
+import subprocess
+import importlib.util
+import time
+from typing import Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORDS = (
+    "torrent magnet mirror upload download piece peer swarm seed archive "
+    "volume thread level ratio speed memory buffer cache stream chunk"
+).split()
+
+
+class NullProgress:
+    """Progress sink so FileCompressor runs without a Telegram message"""
+
+    def update(self, text: str) -> None:
+        pass
+
+
+def load_compressor_module():
+    """Import magnet-to-mirror.py, whose file name is not a valid module name"""
+    spec = importlib.util.spec_from_file_location(
+        "magnet_to_mirror", os.path.join(REPO_ROOT, "magnet-to-mirror.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _write_random(path: str, size: int, chunk: int = 1048576) -> None:
+    with open(path, "wb") as f:
+        while size > 0:
+            block = min(chunk, size)
+            f.write(os.urandom(block))
+            size -= block
+
+
+def _write_text(path: str, size: int, rng: random.Random) -> None:
+    lines = []
+    written = 0
+    while written < size:
+        line = " ".join(rng.choice(WORDS) for _ in range(12)) + "\n"
+        lines.append(line)
+        written += len(line)
+    with open(path, "w") as f:
+        f.writelines(lines)
+
+
+def generate_video(root: str, size: int) -> None:
+    """A few large incompressible files, like already-encoded video"""
+    target = os.path.join(root, "Season 01")
+    os.makedirs(target)
+    count = 4
+    for i in range(count):
+        _write_random(os.path.join(target, f"episode_{i + 1:02d}.mkv"), size // count)
+
+
+def generate_text(root: str, size: int, file_size: int = 16 * 1024) -> None:
+    """Many small compressible text files spread over nested directories"""
+    rng = random.Random(0)
+    for i in range(max(1, size // file_size)):
+        target = os.path.join(root, "docs", f"part_{i // 100:03d}")
+        os.makedirs(target, exist_ok=True)
+        _write_text(os.path.join(target, f"file_{i:05d}.txt"), file_size, rng)
+
+
+def generate_mixed(root: str, size: int) -> None:
+    """Mostly video with subtitles, samples and text extras alongside"""
+    generate_video(root, size * 3 // 4)
+    generate_text(root, size // 4)
+
+
+CORPORA = {
+    "video": generate_video,
+    "text": generate_text,
+    "mixed": generate_mixed,
+}
+
+
+def build_matrix(args: argparse.Namespace) -> list:
+    """Expand the CLI options into unique benchmark configurations"""
+    matrix = []
+    seen = set()
+    for fmt, level, threads, volume in itertools.product(
+        args.formats, args.levels, args.threads, args.volumes
+    ):
+        archive_format, _, method = fmt.partition(":")
+        if archive_format == "tar":
+            # tar only stores, so level and threads don't apply
+            method, level, threads = "", 0, "on"
+        elif archive_format == "tar+zstd":
+            # zstd writes a single stream and has no level 0
+            method, level, volume = "", max(1, level), "none"
+        config = {
+            "format": archive_format,
+            "method": method or None,
+            "level": level,
+            "threads": threads,
+            "volume_size": None if volume == "none" else volume,
+        }
+        key = tuple(config.items())
+        if key not in seen:
+            seen.add(key)
+            matrix.append(config)
+    return matrix
+
+
+def make_compressor(config: dict):
+    """FileCompressor for one configuration, adding volumes only for benchmarks"""
+    module = load_compressor_module()
+    volume_size = config["volume_size"]
+
+    class BenchmarkCompressor(module.FileCompressor):
+        def _build_command(self, archive_path: str, subdirs: list) -> list:
+            command = super()._build_command(archive_path, subdirs)
+            if volume_size:
+                # compress_folder returns one path, so volumes stay out of main
+                command.insert(command.index(archive_path), f"-v{volume_size}")
+            return command
+
+    compressor = BenchmarkCompressor(NullProgress())
+    compressor.archive_format = config["format"]
+    compressor.method = config["method"]
+    compressor.level = config["level"]
+    compressor.threads = config["threads"]
+    return compressor
+
+
+def compress_tar_zstd(corpus_dir: str, output_name: str, config: dict) -> bool:
+    """tar the corpus subdirectories and pipe them through the zstd CLI"""
+    subdirs = sorted(
+        name
+        for name in os.listdir(corpus_dir)
+        if os.path.isdir(os.path.join(corpus_dir, name))
+    )
+    # -T0 lets zstd pick one worker per core, like -mmt=on
+    threads = "0" if config["threads"] == "on" else str(config["threads"])
+    tar = subprocess.Popen(
+        ["tar", "-cf", "-", "-C", corpus_dir] + subdirs, stdout=subprocess.PIPE
+    )
+    zstd = subprocess.run(
+        [
+            "zstd",
+            "-q",
+            "-f",
+            f"-{config['level']}",
+            f"-T{threads}",
+            "-o",
+            f"{output_name}.tar.zst",
+        ],
+        stdin=tar.stdout,
+    )
+    tar.stdout.close()
+    return tar.wait() == 0 and zstd.returncode == 0
+
+
+def volume_bytes(volume: str) -> int:
+    """Size in bytes of a 7z -v value such as 64m or 1g"""
+    units = {"b": 1, "k": 1024, "m": 1024**2, "g": 1024**3}
+    unit = volume[-1].lower()
+    if unit in units:
+        return int(volume[:-1]) * units[unit]
+    return int(volume)
+
+
+def run_case(corpus_dir: str, config: dict, work_dir: str) -> dict:
+    """Compress one corpus with one configuration, meant to run in a worker"""
+    output_name = os.path.join(work_dir, "bench")
+    input_size = sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(corpus_dir)
+        for name in names
+    )
+
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    start = time.perf_counter()
+    if config["format"] == "tar+zstd":
+        archive = compress_tar_zstd(corpus_dir, output_name, config) or None
+    else:
+        archive = make_compressor(config).compress_folder(corpus_dir, output_name)
+    elapsed = time.perf_counter() - start
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    outputs = glob.glob(f"{output_name}.*")
+    output_size = sum(os.path.getsize(path) for path in outputs)
+    for path in outputs:
+        os.remove(path)
+
+    return {
+        "success": archive is not None,
+        "input_bytes": input_size,
+        "output_bytes": output_size,
+        "volumes": len(outputs),
+        "seconds": elapsed,
+        "mb_per_s": input_size / 1048576 / elapsed if elapsed > 0 else 0.0,
+        "ratio": output_size / input_size if input_size else 0.0,
+        "cpu_seconds": (after.ru_utime - before.ru_utime)
+        + (after.ru_stime - before.ru_stime),
+        # ru_maxrss is reported in kilobytes on Linux
+        "peak_rss_mb": after.ru_maxrss / 1024,
+    }
+
+
+def run_isolated(corpus_dir: str, config: dict, work_dir: str) -> dict:
+    """Run a case in a fresh interpreter so RUSAGE_CHILDREN covers only its run"""
+    process = subprocess.run(
+        [
+            sys.executable,
+            os.path.abspath(__file__),
+            "--run-case",
+            json.dumps({"corpus": corpus_dir, "config": config, "work": work_dir}),
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        cwd=work_dir,
+    )
+    if process.returncode != 0:
+        return {"success": False, "error": process.stderr.strip()[-500:]}
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def format_table(results: list) -> str:
+    header = (
+        f"{'corpus':<7} {'format':<12} {'lvl':>3} {'mmt':>4} {'volume':>7} "
+        f"{'MB/s':>9} {'ratio':>7} {'cpu s':>8} {'rss MB':>8}"
+    )
+    rows = [header, "-" * len(header)]
+    for result in results:
+        config = result["config"]
+        fmt = config["format"] + (f":{config['method']}" if config["method"] else "")
+        prefix = (
+            f"{result['corpus']:<7} {fmt:<12} {config['level']:>3} "
+            f"{str(config['threads']):>4} {str(config['volume_size'] or '-'):>7} "
+        )
+        if not result["success"]:
+            rows.append(prefix + "failed")
+            continue
+        rows.append(
+            prefix
+            + f"{result['mb_per_s']:>9.1f} {result['ratio']:>7.3f} "
+            f"{result['cpu_seconds']:>8.2f} {result['peak_rss_mb']:>8.1f}"
+        )
+    return "\n".join(rows)
+
+
+def parse_args(argv: Optional[list] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--corpora",
+        type=lambda v: v.split(","),
+        default=list(CORPORA),
+        help="comma separated corpora: video,text,mixed",
+    )
+    parser.add_argument(
+        "--formats",
+        type=lambda v: v.split(","),
+        default=["7z:lzma2", "7z:copy", "tar", "zip:deflate", "tar+zstd"],
+        help="comma separated format[:method] entries, tar+zstd uses the zstd CLI",
+    )
+    parser.add_argument(
+        "--levels", type=lambda v: [int(x) for x in v.split(",")], default=[0, 1, 5]
+    )
+    parser.add_argument(
+        "--threads",
+        type=lambda v: v.split(","),
+        default=["on", "1", str(os.cpu_count() or 1)],
+        help="comma separated -mmt values, also used as zstd -T",
+    )
+    parser.add_argument(
+        "--volumes",
+        type=lambda v: v.split(","),
+        help="comma separated -v sizes, 'none' for a single archive "
+        "(default: none and a quarter of --scale-mb)",
+    )
+    parser.add_argument("--scale-mb", type=int, default=256, help="size per corpus")
+    parser.add_argument("--json", help="write results to this JSON file")
+    parser.add_argument("--work-dir", help="where corpora and archives are written")
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.volumes is None:
+        # Volumes only split when they are smaller than the corpus
+        args.volumes = ["none", f"{max(1, args.scale_mb // 4)}m"]
+    return args
+
+
+def main(argv: Optional[list] = None) -> None:
+    args = parse_args(argv)
+
+    if args.run_case:
+        case = json.loads(args.run_case)
+        print(json.dumps(run_case(case["corpus"], case["config"], case["work"])))
+        return
+
+    if not shutil.which("7z"):
+        sys.exit("7z not found in PATH")
+    if "tar+zstd" in args.formats and not shutil.which("zstd"):
+        sys.exit("zstd not found in PATH, install it or drop tar+zstd from --formats")
+
+    corpus_bytes = args.scale_mb * 1024 * 1024
+    for volume in args.volumes:
+        if volume != "none" and volume_bytes(volume) >= corpus_bytes:
+            print(
+                f"warning: volume size {volume} is not smaller than the "
+                f"{args.scale_mb} MB corpus, so those archives won't be split",
+                file=sys.stderr,
+            )
+
+    work_dir = tempfile.mkdtemp(prefix="compression-bench-", dir=args.work_dir)
+    matrix = build_matrix(args)
+    results = []
+
+    try:
+        for corpus in args.corpora:
+            corpus_dir = os.path.join(work_dir, corpus)
+            os.makedirs(corpus_dir)
+            CORPORA[corpus](corpus_dir, corpus_bytes)
+
+            for config in matrix:
+                result = run_isolated(corpus_dir, config, work_dir)
+                result.update(corpus=corpus, config=config)
+                results.append(result)
+                print(format_table([result]).splitlines()[-1], flush=True)
+
+            shutil.rmtree(corpus_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print()
+    print(format_table(results))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,13 +4,21 @@ import os
 import time
 import json
 import base64
+import hashlib
 import re
 import requests
 import subprocess
+import tempfile
+import threading
+import fcntl
+import resource
 import libtorrent as lt
 import logging
-from typing import Optional, Tuple
-from dataclasses import dataclass
+from collections import deque
+from logging.handlers import RotatingFileHandler
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional, Tuple
+from dataclasses import asdict, dataclass
 from datetime import datetime
 from enum import Enum
 from requests_toolbelt import MultipartEncoder, MultipartEncoderMonitor
@@ -19,15 +27,38 @@ from requests_toolbelt import MultipartEncoder, MultipartEncoderMonitor
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[logging.FileHandler("torrent_downloader.log"), logging.StreamHandler()],
+    handlers=[
+        RotatingFileHandler(
+            "torrent_downloader.log", maxBytes=10 * 1024 * 1024, backupCount=3
+        ),
+        logging.StreamHandler(),
+    ],
 )
 logger = logging.getLogger(__name__)
 
 
+def get_env_int(name: str, default: Optional[int] = None) -> Optional[int]:
+    """Read an integer environment variable, logging and ignoring bad values"""
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        logger.error(f"Invalid {name}={value!r}, expected an integer")
+        return default
+
+
 class UploadService(Enum):
     GOFILE = "go"
 
 
+class LinkStatus(Enum):
+    VALID = "valid"
+    GONE = "gone"
+    UNKNOWN = "unknown"
+
+
 class TelegramNotifier:
     def __init__(self, bot_id: str, chat_id: str):
         self.bot_id = bot_id
@@ -179,11 +210,500 @@ class DownloadStatus:
     downloaded: int
 
 
+@dataclass
+class MemoryBudget:
+    """Splits one memory budget across libtorrent, upload buffers and 7z workers"""
+
+    total: int  # bytes
+    torrent_share: float = 0.5
+    upload_share: float = 0.1
+    compression_share: float = 0.4
+    compression_thread_memory: int = 128 * 1024 * 1024  # per 7z worker thread
+
+    @classmethod
+    def from_env(cls) -> Optional["MemoryBudget"]:
+        budget_mb = get_env_int("MEMORY_BUDGET_MB")
+        if not budget_mb or budget_mb <= 0:
+            return None
+        return cls(total=budget_mb * 1024 * 1024)
+
+    @property
+    def torrent_bytes(self) -> int:
+        return int(self.total * self.torrent_share)
+
+    @property
+    def upload_bytes(self) -> int:
+        return int(self.total * self.upload_share)
+
+    @property
+    def compression_bytes(self) -> int:
+        return int(self.total * self.compression_share)
+
+    def torrent_settings(self, connections_limit: int = 200) -> dict:
+        """libtorrent settings splitting torrent_bytes across cache and buffers"""
+        block_size = 16 * 1024
+        # libtorrent 2.x does disk I/O through mmap and ignores cache_size, so
+        # there the whole share goes to the disk queue and peer buffers
+        has_cache = int(lt.__version__.split(".")[0]) < 2
+        cache = self.torrent_bytes * 2 // 5 if has_cache else 0
+        buffers = (self.torrent_bytes - cache) // 3
+        per_peer = max(block_size, buffers // connections_limit)
+
+        settings = {
+            "connections_limit": connections_limit,
+            "max_queued_disk_bytes": buffers,
+            "send_buffer_watermark": per_peer,
+            "send_buffer_low_watermark": per_peer // 2,
+            "max_peer_recv_buffer_size": per_peer,
+        }
+        if has_cache:
+            settings["cache_size"] = max(1, cache // block_size)
+        elif "disk_write_mode" in lt.default_settings():
+            # Write with pwrite() rather than dirtying mmap pages (2.0.8+)
+            settings["disk_write_mode"] = 0
+        return settings
+
+    def compression_threads(self) -> int:
+        threads = self.compression_bytes // self.compression_thread_memory
+        return max(1, min(threads, os.cpu_count() or 1))
+
+    def upload_chunk_size(self) -> int:
+        return max(64 * 1024, min(self.upload_bytes, 4 * 1024 * 1024))
+
+
+class MemoryMonitor:
+    """Samples resident memory in the background and keeps the per-job peak"""
+
+    def __init__(self, job_state: Optional["JobState"] = None, interval: float = 1.0):
+        self.job_state = job_state
+        self.interval = interval
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def current_rss() -> int:
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            # ru_maxrss is reported in kilobytes on Linux
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    @staticmethod
+    def children_peak_rss() -> int:
+        return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024
+
+    def _run(self) -> None:
+        reported = None
+        while not self._stop.is_set():
+            self.peak_rss = max(self.peak_rss, self.current_rss())
+            usage = (self.peak_rss, self.children_peak_rss())
+            if self.job_state and usage != reported:
+                self.job_state.update_memory(
+                    peak_rss=usage[0], children_peak_rss=usage[1]
+                )
+                reported = usage
+            self._stop.wait(self.interval)
+
+    def start(self) -> None:
+        self.peak_rss = self.current_rss()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> dict:
+        """Stop sampling and record the final peaks on the job, safe to repeat"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.peak_rss = max(self.peak_rss, self.current_rss())
+        usage = {
+            "peak_rss": self.peak_rss,
+            "children_peak_rss": self.children_peak_rss(),
+        }
+        if self.job_state:
+            self.job_state.update_memory(**usage)
+        return usage
+
+
+class JobState:
+    """Thread-safe in-memory view of the current job and finished job history"""
+
+    def __init__(self, max_history: int = 50, history_path: Optional[str] = None):
+        self._cond = threading.Condition()
+        self._version = 0
+        self.current = None
+        self.history = deque(maxlen=max_history)
+        self.history_path = history_path
+        self._load_history()
+
+    def _load_history(self) -> None:
+        """Load finished jobs from earlier runs out of the JSON-lines history file"""
+        if not self.history_path:
+            return
+        try:
+            with open(self.history_path) as f:
+                for line in f:
+                    try:
+                        self.history.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        logger.warning("Skipping malformed job history line")
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"Job history unreadable: {str(e)}")
+
+    def _append_history(self, job: dict) -> None:
+        if not self.history_path:
+            return
+        try:
+            with open(self.history_path, "a") as f:
+                f.write(json.dumps(job) + "\n")
+        except OSError as e:
+            logger.error(f"Job history write failed: {str(e)}")
+
+    def _changed(self) -> None:
+        # Caller must hold the condition lock
+        self._version += 1
+        self._cond.notify_all()
+
+    def start_job(self, name: str) -> None:
+        with self._cond:
+            self.current = {
+                "name": name,
+                "stage": "starting",
+                "started_at": datetime.now().isoformat(timespec="seconds"),
+                "finished_at": None,
+                "download": None,
+                "compression": None,
+                "upload": None,
+                "memory": None,
+                "success": None,
+                "download_link": None,
+                "error": None,
+            }
+            self._changed()
+
+    def set_stage(self, stage: str) -> None:
+        with self._cond:
+            if self.current is not None:
+                self.current["stage"] = stage
+                self._changed()
+
+    def update_download(self, status: DownloadStatus) -> None:
+        with self._cond:
+            if self.current is not None:
+                # A streamed upload overlaps the download, keep reporting both
+                if self.current["stage"] != "streaming":
+                    self.current["stage"] = "downloading"
+                self.current["download"] = asdict(status)
+                self._changed()
+
+    def update_compression(self, **fields) -> None:
+        with self._cond:
+            if self.current is not None:
+                self.current["stage"] = "compressing"
+                self.current["compression"] = dict(
+                    self.current["compression"] or {}, **fields
+                )
+                self._changed()
+
+    def update_upload(self, **fields) -> None:
+        with self._cond:
+            if self.current is not None:
+                if self.current["stage"] in ("downloading", "streaming"):
+                    self.current["stage"] = "streaming"
+                else:
+                    self.current["stage"] = "uploading"
+                self.current["upload"] = dict(self.current["upload"] or {}, **fields)
+                self._changed()
+
+    def update_memory(self, **fields) -> None:
+        with self._cond:
+            if self.current is not None:
+                self.current["memory"] = dict(self.current["memory"] or {}, **fields)
+                self._changed()
+
+    def finish_job(
+        self,
+        success: bool,
+        download_link: Optional[str] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        with self._cond:
+            if self.current is None:
+                return
+            self.current["stage"] = "finished" if success else "failed"
+            self.current["success"] = success
+            self.current["finished_at"] = datetime.now().isoformat(timespec="seconds")
+            if download_link:
+                self.current["download_link"] = download_link
+            if error:
+                self.current["error"] = error
+            self.history.append(dict(self.current))
+            self._append_history(self.current)
+            self.current = None
+            self._changed()
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                "version": self._version,
+                "current": dict(self.current) if self.current else None,
+                "history": list(self.history),
+            }
+
+    def wait_for_change(self, version: int, timeout: float) -> Optional[dict]:
+        """Block until state moves past version, return snapshot or None on timeout"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._version != version, timeout):
+                return None
+            return self.snapshot()
+
+
+class StatusServer:
+    """Optional local HTTP server exposing JobState as JSON and server-sent events"""
+
+    def __init__(self, job_state: JobState, host: str = "127.0.0.1", port: int = 8080):
+        self.job_state = job_state
+        self.host = host
+        self.port = port
+        self.keepalive_interval = 15
+        self.min_event_interval = 0.5
+        self.httpd = None
+        self.thread = None
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                logger.debug(f"Status server: {format % args}")
+
+            def _send_json(self, data, code: int = 200) -> None:
+                body = json.dumps(data).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Cache-Control", "no-cache")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _stream_events(self) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "keep-alive")
+                self.end_headers()
+
+                snapshot = server.job_state.snapshot()
+                try:
+                    while server.httpd is not None:
+                        if snapshot is None:
+                            self.wfile.write(b": keepalive\n\n")
+                        else:
+                            payload = json.dumps(snapshot)
+                            self.wfile.write(
+                                f"id: {snapshot['version']}\ndata: {payload}\n\n".encode(
+                                    "utf-8"
+                                )
+                            )
+                            last_version = snapshot["version"]
+                            # Coalesce bursts of updates from the download loop
+                            time.sleep(server.min_event_interval)
+                        self.wfile.flush()
+                        snapshot = server.job_state.wait_for_change(
+                            last_version, server.keepalive_interval
+                        )
+                except (BrokenPipeError, ConnectionResetError):
+                    logger.debug("Status event stream client disconnected")
+
+            def do_GET(self):
+                path = self.path.split("?", 1)[0].rstrip("/") or "/"
+                if path in ("/", "/status"):
+                    snapshot = server.job_state.snapshot()
+                    self._send_json(
+                        {"version": snapshot["version"], "current": snapshot["current"]}
+                    )
+                elif path == "/history":
+                    self._send_json(server.job_state.snapshot()["history"])
+                elif path == "/events":
+                    self._stream_events()
+                else:
+                    self._send_json({"error": "Not found"}, code=404)
+
+        return Handler
+
+    def start(self) -> bool:
+        try:
+            self.httpd = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+            self.httpd.daemon_threads = True
+        except (OSError, OverflowError) as e:
+            logger.error(f"Status server failed to start: {str(e)}")
+            self.httpd = None
+            return False
+
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        logger.info(f"Status server listening on http://{self.host}:{self.port}")
+        return True
+
+    def stop(self) -> None:
+        httpd, self.httpd = self.httpd, None
+        if httpd:
+            httpd.shutdown()
+            httpd.server_close()
+
+
+class TorrentStream:
+    """Blocking readable stream over the completed prefix of a single-file torrent
+
+    Every piece is checked against its SHA-1 from the metadata before any of its
+    bytes are handed out, so holes in the sparse file can never be uploaded.
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        total_size: int,
+        piece_length: int,
+        piece_hashes: Optional[list] = None,
+        chunk_size: int = 1048576,
+    ):
+        self.file_path = file_path
+        self.total_size = total_size
+        self.piece_length = piece_length
+        self.piece_hashes = piece_hashes
+        self.chunk_size = chunk_size
+        self.verify_retries = 30
+        self.verify_delay = 1
+        self._cond = threading.Condition()
+        self._available = 0
+        self._position = 0
+        self._error = None
+        self._file = None
+        self._piece_index = None
+        self._piece_data = b""
+
+    @property
+    def len(self) -> int:
+        # Remaining bytes, used by requests_toolbelt to size the multipart body
+        return self.total_size - self._position
+
+    @property
+    def available(self) -> int:
+        with self._cond:
+            return self._available
+
+    @property
+    def aborted(self) -> bool:
+        with self._cond:
+            return self._error is not None
+
+    def tell(self) -> int:
+        return self._position
+
+    def rewind(self) -> None:
+        """Start reading from the beginning again, used when an upload is retried"""
+        self._position = 0
+
+    def publish(self, available: int) -> None:
+        """Mark the first `available` bytes as complete and readable"""
+        with self._cond:
+            available = min(available, self.total_size)
+            if available > self._available:
+                self._available = available
+                self._cond.notify_all()
+
+    def finish(self) -> None:
+        self.publish(self.total_size)
+
+    def abort(self, error: str) -> None:
+        with self._cond:
+            self._error = error
+            self._cond.notify_all()
+
+    def _verified_piece(self, piece: int) -> bytes:
+        """Read a piece from disk, re-reading until it matches its SHA-1 hash"""
+        start = piece * self.piece_length
+        length = min(self.piece_length, self.total_size - start)
+
+        if self._file is None:
+            self._file = open(self.file_path, "rb")
+
+        for attempt in range(self.verify_retries):
+            self._file.seek(start)
+            data = self._file.read(length)
+            if (
+                not self.piece_hashes
+                or hashlib.sha1(data).digest() == self.piece_hashes[piece]
+            ):
+                return data
+            logger.warning(f"Piece {piece} not on disk yet (attempt {attempt + 1})")
+            time.sleep(self.verify_delay)
+
+        raise IOError(
+            f"Piece {piece} failed hash check after {self.verify_retries} reads"
+        )
+
+    def read(self, size: int = -1) -> bytes:
+        if self._position >= self.total_size:
+            return b""
+
+        piece = self._position // self.piece_length
+        piece_end = min((piece + 1) * self.piece_length, self.total_size)
+
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self._available >= piece_end or self._error is not None
+            )
+            if self._error is not None:
+                raise IOError(f"Torrent stream aborted: {self._error}")
+
+        if piece != self._piece_index:
+            self._piece_data = self._verified_piece(piece)
+            self._piece_index = piece
+
+        offset = self._position - piece * self.piece_length
+        remaining = len(self._piece_data) - offset
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        size = min(size, self.chunk_size)
+
+        data = self._piece_data[offset : offset + size]
+        self._position += len(data)
+        return data
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._piece_index = None
+        self._piece_data = b""
+
+
 class TorrentDownloader:
-    def __init__(self, download_path: str, progress_message: ProgressMessage):
+    def __init__(
+        self,
+        download_path: str,
+        progress_message: ProgressMessage,
+        job_state: Optional[JobState] = None,
+        memory_budget: Optional[MemoryBudget] = None,
+    ):
         self.download_path = download_path
         self.progress_message = progress_message
+        self.job_state = job_state or JobState()
+        self.memory_budget = memory_budget
         self.session = self._configure_session()
+        self.stream = None
+        self.stream_min_window = 8  # pieces
+        self.stream_max_window = 128  # pieces
+        self.stream_buffer_seconds = 20
+        self.stream_stall_timeout = 120  # seconds without upload progress
+        # libtorrent 1.x keeps verified pieces in a write cache, 2.x uses mmap
+        self.has_write_cache = int(lt.__version__.split(".")[0]) < 2
 
     def _configure_session(self) -> lt.session:
         session = lt.session()
@@ -200,12 +720,18 @@ class TorrentDownloader:
             "request_timeout": 10,
             "seed_time_limit": 0,
             "dht_announce_interval": 30,
-            "alert_mask": lt.alert.category_t.all_categories,
+            # Only the categories this script reacts to, so bursts of peer and
+            # block alerts can't crowd the queue
+            "alert_mask": lt.alert.category_t.status_notification
+            | lt.alert.category_t.error_notification
+            | lt.alert.category_t.storage_notification,
             "enable_dht": True,
             "enable_lsd": True,
             "enable_upnp": True,
             "enable_natpmp": True,
         }
+        if self.memory_budget:
+            settings.update(self.memory_budget.torrent_settings())
         session.apply_settings(settings)
         return session
 
@@ -219,6 +745,24 @@ class TorrentDownloader:
             logger.error(f"Name extraction failed: {str(e)}")
         return "Unknown_torrent"
 
+    @staticmethod
+    def extract_info_hash_from_magnet(magnet_link: str) -> Optional[str]:
+        try:
+            # Hybrid magnets carry both, btih is preferred so the key doesn't
+            # depend on parameter order; btmh is only a fallback for v2-only
+            match = re.search(r"xt=urn:btih:([0-9A-Za-z]+)", magnet_link)
+            if not match:
+                match = re.search(r"xt=urn:btmh:([0-9A-Za-z]+)", magnet_link)
+            if match:
+                info_hash = match.group(1)
+                if len(info_hash) == 32:
+                    # Base32 hashes are converted so both encodings share one key
+                    info_hash = base64.b32decode(info_hash.upper()).hex()
+                return info_hash.lower()
+        except Exception as e:
+            logger.error(f"Info-hash extraction failed: {str(e)}")
+        return None
+
     def get_download_status(self, handle: lt.torrent_handle) -> DownloadStatus:
         status = handle.status()
 
@@ -247,7 +791,93 @@ class TorrentDownloader:
         filled = int(width * percentage / 100)
         return "█" * filled + "░" * (width - filled)
 
-    def download_torrent(self, magnet_link: str) -> Tuple[bool, Optional[str]]:
+    def _start_stream(self, handle: lt.torrent_handle) -> Optional[TorrentStream]:
+        """Switch a single-file torrent to sequential download and open its stream"""
+        info = handle.get_torrent_info()
+        if info.num_files() != 1:
+            logger.info("Streaming skipped - torrent has multiple files")
+            return None
+
+        handle.set_sequential_download(True)
+        file_path = os.path.join(self.download_path, info.files().file_path(0))
+        logger.info(f"Streaming enabled for {file_path}")
+
+        # v2-only torrents carry no SHA-1 piece hashes to verify against
+        piece_hashes = None
+        if not hasattr(info, "info_hashes") or info.info_hashes().has_v1():
+            piece_hashes = [
+                bytes(info.hash_for_piece(i)) for i in range(info.num_pieces())
+            ]
+
+        stream = TorrentStream(
+            file_path, info.total_size(), info.piece_length(), piece_hashes
+        )
+        if self.memory_budget:
+            stream.chunk_size = self.memory_budget.upload_chunk_size()
+        return stream
+
+    def _stream_window(self, handle: lt.torrent_handle, piece_length: int) -> int:
+        """Size the deadline window to cover a few seconds of current throughput"""
+        status = handle.status()
+        window = int(status.download_rate * self.stream_buffer_seconds / piece_length)
+        # Keep every connected peer busy so a narrow window can't starve the swarm
+        window = max(window, status.num_peers, self.stream_min_window)
+        return min(window, self.stream_max_window)
+
+    def _advance_stream(self, handle: lt.torrent_handle, stream_state: dict) -> None:
+        """Move the completed prefix forward and refresh piece deadlines"""
+        info = handle.get_torrent_info()
+        num_pieces = info.num_pieces()
+        piece_length = info.piece_length()
+
+        prefix = stream_state["prefix"]
+        while prefix < num_pieces and handle.have_piece(prefix):
+            prefix += 1
+
+        if prefix > stream_state["prefix"]:
+            # TorrentStream hash-checks every piece on read, so the prefix can be
+            # published straight away; 1.x only needs a nudge to write it out
+            if self.has_write_cache:
+                handle.flush_cache()
+            self.stream.publish(prefix * piece_length)
+
+        window = self._stream_window(handle, piece_length)
+        if prefix == stream_state["prefix"] and window == stream_state["window"]:
+            return
+
+        status = handle.status()
+        piece_ms = int(piece_length / max(status.download_rate, 1) * 1000)
+        for offset, piece in enumerate(range(prefix, min(prefix + window, num_pieces))):
+            if not handle.have_piece(piece):
+                handle.set_piece_deadline(piece, offset * piece_ms)
+
+        stream_state["prefix"] = prefix
+        stream_state["window"] = window
+
+    def _wait_for_stream(self, stream_thread: threading.Thread) -> None:
+        """Wait for the streamed upload, aborting only once it stops moving"""
+        # A slow but progressing upload is left alone, restarting it from byte
+        # 0 through upload_file would only take longer
+        last_position = self.stream.tell()
+        last_progress = time.time()
+        while stream_thread.is_alive():
+            stream_thread.join(5)
+            position = self.stream.tell()
+            if position != last_position or position >= self.stream.total_size:
+                # Once the body is sent, the uploader's read timeout takes over
+                last_position = position
+                last_progress = time.time()
+            elif time.time() - last_progress > self.stream_stall_timeout:
+                logger.error("Streaming upload stalled, falling back to upload")
+                self.stream.abort("Streaming upload stalled")
+                stream_thread.join(self.stream_stall_timeout)
+                return
+
+    def download_torrent(
+        self,
+        magnet_link: str,
+        stream_consumer: Optional[Callable[[TorrentStream], None]] = None,
+    ) -> Tuple[bool, Optional[str]]:
         torrent_name = self.extract_name_from_magnet(magnet_link)
         logger.info(f"Starting download: {torrent_name}")
 
@@ -267,12 +897,27 @@ class TorrentDownloader:
                 if not handle.is_valid():
                     raise RuntimeError("Failed to get metadata")
 
+            stream_thread = None
+            stream_state = {"prefix": 0, "window": 0}
+            if stream_consumer:
+                self.stream = self._start_stream(handle)
+                if self.stream:
+                    stream_thread = threading.Thread(
+                        target=stream_consumer, args=(self.stream,), daemon=True
+                    )
+                    stream_thread.start()
+
             start_time = time.time()
             last_update_time = 0
             update_interval = 1
 
             while not handle.is_seed():
                 status = self.get_download_status(handle)
+                self.job_state.update_download(status)
+                if self.stream:
+                    self._advance_stream(handle, stream_state)
+                # Drain alerts every tick so the queue can't grow
+                self.session.pop_alerts()
                 current_time = time.time()
 
                 if current_time - last_update_time >= update_interval:
@@ -305,9 +950,17 @@ class TorrentDownloader:
 
                 time.sleep(0.1)
 
+            if stream_thread:
+                if self.has_write_cache:
+                    handle.flush_cache()
+                self.stream.finish()
+                self._wait_for_stream(stream_thread)
+
             return True, torrent_name
 
         except Exception as e:
+            if self.stream:
+                self.stream.abort(str(e))
             error_msg = f"❌ Download failed: {str(e)}"
             self.progress_message.update(error_msg)
             logger.error(f"Download failed: {str(e)}")
@@ -325,9 +978,16 @@ class TorrentDownloader:
 
 
 class FileUploader:
-    def __init__(self, progress_message: ProgressMessage):
+    def __init__(
+        self, progress_message: ProgressMessage, job_state: Optional[JobState] = None
+    ):
         self.progress_message = progress_message
+        self.job_state = job_state or JobState()
         self.upload_script = "./upload.sh"
+        self.upload_url = "https://upload.gofile.io/uploadFile"
+        self.stream_timeout = (10, 300)  # connect, read
+        self.api_url = "https://api.gofile.io"
+        self.api_token = os.getenv("GOFILE_TOKEN")
         self.retries = 3
         self.retry_delay = 5
         self.max_file_size = 10 * 1024 * 1024 * 1024  # 10GB in bytes
@@ -360,6 +1020,14 @@ class FileUploader:
             f"Starting upload of {filename} (Size: {self._format_size(file_size)})"
         )
 
+        self.job_state.update_upload(
+            file=filename,
+            path=file_path,
+            size=file_size,
+            status="uploading",
+            download_link=None,
+        )
+
         # Update message to show upload started
         self.progress_message.update(
             "✅ Download Complete!\n"
@@ -397,6 +1065,9 @@ class FileUploader:
 
                 final_message = "\n".join(final_parts)
                 logger.info(f"Upload successful: {download_link}")
+                self.job_state.update_upload(
+                    status="complete", download_link=download_link
+                )
 
                 self.progress_message.update(final_message)
                 return True
@@ -406,6 +1077,7 @@ class FileUploader:
 
         except Exception as e:
             logger.error(f"Upload error: {str(e)}")
+            self.job_state.update_upload(status="failed", error=str(e))
             error_parts = [
                 "✅ Download Complete!",
                 "✅ Compression Complete!"
@@ -418,6 +1090,144 @@ class FileUploader:
             self.progress_message.update("\n".join(error_parts))
             return False
 
+    def _api_token(self) -> Optional[str]:
+        """GoFile API token, a guest account is created when none is configured"""
+        if self.api_token:
+            return self.api_token
+        try:
+            response = requests.post(f"{self.api_url}/accounts", timeout=10)
+            self.api_token = response.json()["data"]["token"]
+        except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+            logger.error(f"GoFile token request failed: {str(e)}")
+        return self.api_token
+
+    def check_link(self, download_link: str) -> LinkStatus:
+        """Check through the GoFile API whether the uploaded content still exists
+
+        Only an explicit not-found answer counts as gone. Network errors, rate
+        limits and statuses a guest token may not see give LinkStatus.UNKNOWN.
+        """
+        # The download page is a JavaScript app that loads even for deleted
+        # content, so ask the API about the content ID at the end of the link
+        content_id = download_link.rstrip("/").rsplit("/", 1)[-1]
+        token = self._api_token()
+        if not token:
+            return LinkStatus.UNKNOWN
+
+        try:
+            response = requests.get(
+                f"{self.api_url}/contents/{content_id}",
+                headers={"Authorization": f"Bearer {token}"},
+                timeout=10,
+            )
+            status = response.json().get("status")
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.warning(f"Link check failed for {download_link}: {str(e)}")
+            return LinkStatus.UNKNOWN
+
+        if status == "ok":
+            return LinkStatus.VALID
+        if status == "error-notFound":
+            logger.info(f"Link no longer valid: {download_link}")
+            return LinkStatus.GONE
+        logger.warning(f"Link check inconclusive for {download_link} ({status})")
+        return LinkStatus.UNKNOWN
+
+    def report_cached(self, entry: dict) -> None:
+        """Reply with links from the mirror cache instead of uploading again"""
+        final_parts = ["⚡ Already Mirrored!", ""]
+        for file, download_link in zip(entry["files"], entry["links"]):
+            final_parts.extend(
+                [
+                    f"📁 File: {file['name']}",
+                    f"🔗 Download Link: {download_link}",
+                    f"💾 Size: {self._format_size(file['size'])}",
+                ]
+            )
+        self.progress_message.send_initial("\n".join(final_parts))
+
+    def upload_stream(self, stream: TorrentStream) -> bool:
+        """Upload a single-file torrent while it is still downloading"""
+        filename = os.path.basename(stream.file_path)
+
+        if stream.total_size > self.max_file_size:
+            logger.error(
+                f"Streaming upload skipped - {self._format_size(stream.total_size)} exceeds 10GB limit"
+            )
+            return False
+
+        logger.info(
+            f"Starting streaming upload of {filename} (Size: {self._format_size(stream.total_size)})"
+        )
+        self.job_state.update_upload(
+            file=filename,
+            path=stream.file_path,
+            size=stream.total_size,
+            uploaded=0,
+            status="streaming",
+            download_link=None,
+        )
+
+        try:
+            for attempt in range(self.retries):
+                try:
+                    logger.info(
+                        f"Streaming upload attempt {attempt + 1} of {self.retries}"
+                    )
+                    stream.rewind()
+                    download_link = self._post_stream(stream, filename)
+                    if stream.aborted:
+                        raise Exception("Stream aborted before upload completed")
+                    break
+                except Exception as e:
+                    logger.error(f"Streaming upload error: {str(e)}")
+                    self.job_state.update_upload(status="failed", error=str(e))
+                    if stream.aborted or attempt == self.retries - 1:
+                        return False
+                    time.sleep(self.retry_delay * (attempt + 1))
+
+            logger.info(f"Streaming upload successful: {download_link}")
+            self.job_state.update_upload(status="complete", download_link=download_link)
+
+            final_parts = [
+                "✅ Download Complete!",
+                "📝 No compression needed",
+                "✅ Upload Complete!",
+                "",
+                f"📁 File: {filename}",
+                f"🔗 Download Link: {download_link}",
+                f"💾 Size: {self._format_size(stream.total_size)}",
+            ]
+            self.progress_message.update("\n".join(final_parts))
+            return True
+        finally:
+            stream.close()
+
+    def _post_stream(self, stream: TorrentStream, filename: str) -> str:
+        """Send one multipart upload of the stream and return the download link"""
+
+        def on_progress(monitor: MultipartEncoderMonitor) -> None:
+            self.job_state.update_upload(uploaded=monitor.bytes_read)
+
+        encoder = MultipartEncoder(
+            fields={"file": (filename, stream, "application/octet-stream")}
+        )
+        monitor = MultipartEncoderMonitor(encoder, on_progress)
+        response = requests.post(
+            self.upload_url,
+            data=monitor,
+            headers={
+                "Content-Type": monitor.content_type,
+                "Accept": "application/json",
+                "User-Agent": "Mozilla/5.0",
+            },
+            timeout=self.stream_timeout,
+        )
+        result = response.json()
+        if result.get("status") != "ok":
+            raise Exception(f"Upload failed: {response.text}")
+        return result["data"]["downloadPage"]
+
     def upload_file(self, file_path: str, was_compressed: bool = False) -> bool:
         """Public method to upload a file with retries"""
         if not os.path.exists(file_path):
@@ -462,8 +1272,16 @@ class FileUploader:
 
 
 class FileCompressor:
-    def __init__(self, progress_message: ProgressMessage):
+    def __init__(
+        self, progress_message: ProgressMessage, job_state: Optional[JobState] = None
+    ):
         self.progress_message = progress_message
+        self.job_state = job_state or JobState()
+        self.archive_format = "7z"
+        self.method = "lzma2"
+        self.level = 0
+        self.threads = "on"
+        self.read_chunk_size = 4096
 
     def _has_subdirectories(self, folder_path: str) -> bool:
         """Check if the folder has any subdirectories"""
@@ -518,6 +1336,36 @@ class FileCompressor:
         filled = int(width * percentage / 100)
         return "█" * filled + "░" * (width - filled)
 
+    def _build_command(self, archive_path: str, subdirs: list) -> list:
+        """Build the 7z command line for the configured format and level"""
+        command = [
+            "7z",
+            "a",  # Add files to archive
+            f"-t{self.archive_format}",  # Archive type
+        ]
+        # tar only stores, compression switches are rejected
+        if self.archive_format != "tar":
+            if self.method:
+                command.append(f"-m0={self.method}")  # Compression method
+            command.extend(
+                [
+                    f"-mx={self.level}",  # Compression level
+                    f"-mmt={self.threads}",  # Multithreading, bounded by memory budget
+                ]
+            )
+        command.extend(
+            [
+                "-aoa",  # Overwrite all existing files
+                "-bso0",  # No file listing on stdout
+                "-bsp2",  # Show progress on stderr
+            ]
+        )
+        command.append(archive_path)  # Output archive path
+
+        # Add only subdirectories to compress
+        command.extend(subdirs)
+        return command
+
     def compress_folder(self, folder_path: str, output_name: str) -> Optional[str]:
         """Compress only subdirectories, skip files in root folder"""
         if not os.path.exists(folder_path) or not os.path.isdir(folder_path):
@@ -552,48 +1400,43 @@ class FileCompressor:
                 )
                 return None
 
-            zip_path = f"{output_name}.7z"
+            zip_path = f"{output_name}.{self.archive_format}"
 
             self.progress_message.update(
                 "✅ Download Complete!\n" "🗜️ Preparing compression..."
             )
 
             # Start 7z compression with progress output
-            command = [
-                "7z",
-                "a",  # Add files to archive
-                "-t7z",  # 7z archive type
-                "-m0=lzma2",  # LZMA2 compression method
-                "-mx=0",
-                "-mmt=on",  # Enable multithreading
-                "-aoa",  # Overwrite all existing files
-                "-bsp1",  # Show progress
-                zip_path,  # Output archive path
-            ]
-
-            # Add only subdirectories to compress
-            command.extend(subdirs)
+            command = self._build_command(zip_path, subdirs)
 
             process = subprocess.Popen(
                 command,
-                stdout=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
                 stderr=subprocess.PIPE,
-                universal_newlines=True,
-                bufsize=1,
             )
 
             start_time = time.time()
             processed_size = 0
             speeds = []
             last_progress = 0
+            error_tail = deque(maxlen=20)
+            pending = b""
 
             while True:
-                if process.poll() is not None:
+                # 7z redraws progress with backspaces, so read raw chunks rather
+                # than buffering until a newline that may never come
+                chunk = process.stderr.read1(self.read_chunk_size)
+                if not chunk:
                     break
 
-                line = process.stderr.readline().strip()
-                if not line:
+                segments = re.split(rb"[\r\n\b]+", pending + chunk)
+                pending = segments.pop()[-self.read_chunk_size :]
+                lines = [seg.decode("utf-8", "replace").strip() for seg in segments]
+                error_tail.extend(line for line in lines if line and "%" not in line)
+                progress_lines = [line for line in lines if "%" in line]
+                if not progress_lines:
                     continue
+                line = progress_lines[-1]
 
                 try:
                     # Parse 7z progress output
@@ -608,6 +1451,13 @@ class FileCompressor:
                                 file_match.group(1) if file_match else "Processing..."
                             )
 
+                            self.job_state.update_compression(
+                                progress=progress,
+                                current_file=current_file,
+                                processed=int(total_size * progress / 100),
+                                total_size=total_size,
+                            )
+
                             # Calculate speed only if progress changed
                             if progress > last_progress:
                                 current_time = time.time()
@@ -624,6 +1474,10 @@ class FileCompressor:
                                     speeds.append(speed)
                                     if len(speeds) > 5:
                                         speeds.pop(0)
+                                    self.job_state.update_compression(
+                                        speed=speed,
+                                        avg_speed=sum(speeds) / len(speeds),
+                                    )
 
                                     # Format progress message
                                     message_parts = [
@@ -651,9 +1505,12 @@ class FileCompressor:
                     continue
 
             # Check compression result
-            stdout, stderr = process.communicate()
+            process.wait()
 
             if process.returncode == 0:
+                self.job_state.update_compression(
+                    progress=100.0, processed=total_size, status="complete"
+                )
                 self.progress_message.update(
                     "✅ Download Complete!\n"
                     "✅ Compression Complete!\n"
@@ -661,7 +1518,7 @@ class FileCompressor:
                 )
                 return zip_path
             else:
-                error_output = stderr if stderr else stdout
+                error_output = "\n".join(error_tail)
                 raise subprocess.CalledProcessError(
                     process.returncode,
                     command,
@@ -670,6 +1527,7 @@ class FileCompressor:
 
         except Exception as e:
             logger.error(f"Compression failed: {str(e)}")
+            self.job_state.update_compression(status="failed", error=str(e))
             self.progress_message.update(
                 f"✅ Download Complete!\n"
                 f"❌ Compression failed: {str(e)}\n"
@@ -678,6 +1536,142 @@ class FileCompressor:
             return None
 
 
+class MirrorCache:
+    """Persistent upload links keyed by info-hash and selected file set"""
+
+    def __init__(
+        self,
+        cache_path: str,
+        validator: Callable[[str], LinkStatus],
+        ttl: int = 24 * 3600,
+    ):
+        self.cache_path = cache_path
+        self.lock_path = f"{cache_path}.lock"
+        self.validator = validator
+        self.ttl = ttl
+        self.entries = self._load()
+
+    def _load(self) -> dict:
+        try:
+            with open(self.cache_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"Mirror cache unreadable, starting empty: {str(e)}")
+            return {}
+
+    def _save(self, key: str, entry: Optional[dict]) -> None:
+        """Write one entry, or remove it, merged with what other jobs stored"""
+        directory = os.path.dirname(os.path.abspath(self.cache_path))
+        tmp_path = None
+        try:
+            with open(self.lock_path, "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                self.entries = self._load()
+                if entry is None:
+                    self.entries.pop(key, None)
+                else:
+                    self.entries[key] = entry
+
+                with tempfile.NamedTemporaryFile(
+                    "w", dir=directory, suffix=".tmp", delete=False
+                ) as f:
+                    tmp_path = f.name
+                    json.dump(self.entries, f, indent=2)
+                os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.error(f"Mirror cache save failed: {str(e)}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @staticmethod
+    def cache_key(magnet_link: str) -> Optional[str]:
+        info_hash = TorrentDownloader.extract_info_hash_from_magnet(magnet_link)
+        if not info_hash:
+            return None
+
+        # BEP 53 select-only list, "*" when the whole torrent is mirrored
+        match = re.search(r"[?&]so=([^&]+)", magnet_link)
+        if not match:
+            return f"{info_hash}:*"
+        selected = requests.utils.unquote(match.group(1)).split(",")
+        return f"{info_hash}:{','.join(sorted(set(selected)))}"
+
+    @staticmethod
+    def file_checksum(file_path: str, chunk_size: int = 1048576) -> str:
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def lookup(self, magnet_link: str) -> Optional[dict]:
+        """Return a cached mirror, revalidating its links once the TTL expires"""
+        key = self.cache_key(magnet_link)
+        if not key:
+            return None
+
+        # Pick up entries stored by other jobs since this one started
+        self.entries = self._load()
+        entry = self.entries.get(key)
+        if not entry:
+            return None
+
+        if time.time() - entry["checked_at"] > self.ttl:
+            statuses = [self._validate(link) for link in entry["links"]]
+            if LinkStatus.GONE in statuses:
+                logger.info(f"Mirror cache entry expired: {key}")
+                self._save(key, None)
+                return None
+            if LinkStatus.UNKNOWN in statuses:
+                # Keep serving the entry and check it again on the next lookup
+                logger.warning(f"Could not revalidate mirror cache entry: {key}")
+            else:
+                entry["checked_at"] = time.time()
+                self._save(key, entry)
+
+        logger.info(f"Mirror cache hit: {key}")
+        return entry
+
+    def _validate(self, link: str) -> LinkStatus:
+        try:
+            return self.validator(link)
+        except Exception as e:
+            logger.warning(f"Link check raised for {link}: {str(e)}")
+            return LinkStatus.UNKNOWN
+
+    def store(self, magnet_link: str, name: str, upload: dict) -> None:
+        key = self.cache_key(magnet_link)
+        if not key:
+            logger.warning("No info-hash in magnet link, mirror not cached")
+            return
+
+        # The upload already succeeded, so a checksum failure only skips caching
+        try:
+            checksum = self.file_checksum(upload["path"])
+        except OSError as e:
+            logger.error(f"Checksum failed, mirror not cached: {str(e)}")
+            return
+
+        now = time.time()
+        entry = {
+            "name": name,
+            "links": [upload["download_link"]],
+            "files": [
+                {
+                    "name": upload["file"],
+                    "size": upload["size"],
+                    "sha256": checksum,
+                }
+            ],
+            "created_at": now,
+            "checked_at": now,
+        }
+        self._save(key, entry)
+        logger.info(f"Mirror cached: {key}")
+
+
 def get_magnet_link_from_github(
     repo: str, path: str, branch: str = "main"
 ) -> Optional[str]:
@@ -711,6 +1705,22 @@ def main():
 
     notifier = TelegramNotifier(bot_id, chat_id)
     progress_message = ProgressMessage(notifier)
+    job_state = JobState(
+        history_path=os.getenv(
+            "STATUS_HISTORY_PATH", os.path.join(os.getcwd(), "job_history.jsonl")
+        )
+    )
+    memory_budget = MemoryBudget.from_env()
+    memory_monitor = MemoryMonitor(job_state)
+
+    status_server = None
+    status_port = get_env_int("STATUS_PORT")
+    if status_port:
+        status_server = StatusServer(
+            job_state, os.getenv("STATUS_HOST", "127.0.0.1"), status_port
+        )
+        status_server.start()
+
     download_path = os.path.join(os.getcwd(), "downloads")
     os.makedirs(download_path, exist_ok=True)
 
@@ -724,20 +1734,62 @@ def main():
             progress_message.update(f"❌ {error_msg}")
             return
 
+        uploader = FileUploader(progress_message, job_state)
+        cache_path = os.getenv(
+            "MIRROR_CACHE_PATH", os.path.join(os.getcwd(), "mirror_cache.json")
+        )
+        mirror_cache = MirrorCache(
+            cache_path,
+            uploader.check_link,
+            get_env_int("MIRROR_CACHE_TTL", 24 * 3600),
+        )
+
+        # Repeat requests for the same info-hash are answered from the cache
+        cached = mirror_cache.lookup(magnet_link)
+        if cached:
+            job_state.start_job(cached["name"])
+            uploader.report_cached(cached)
+            job_state.finish_job(True, download_link=cached["links"][0])
+            return
+
         progress_message.send_initial("✨ Starting download...")
-        downloader = TorrentDownloader(download_path, progress_message)
+        job_state.start_job(TorrentDownloader.extract_name_from_magnet(magnet_link))
+        memory_monitor.start()
+        if memory_budget:
+            job_state.update_memory(budget=memory_budget.total)
+        downloader = TorrentDownloader(
+            download_path, progress_message, job_state, memory_budget
+        )
 
-        download_success, torrent_name = downloader.download_torrent(magnet_link)
-        if download_success and torrent_name:
+        # Single-file torrents can be uploaded while the download is running
+        stream_consumer = uploader.upload_stream if os.getenv("STREAM_UPLOAD") else None
+        download_success, torrent_name = downloader.download_torrent(
+            magnet_link, stream_consumer
+        )
+        streamed_state = (job_state.snapshot()["current"] or {}).get("upload") or {}
+        streamed = streamed_state.get("status") == "complete"
+
+        if not download_success:
+            memory_monitor.stop()
+            job_state.finish_job(False, error="Download failed")
+        elif streamed:
+            mirror_cache.store(magnet_link, torrent_name, streamed_state)
+            memory_monitor.stop()
+            job_state.finish_job(True, download_link=streamed_state["download_link"])
+        elif torrent_name:
             # Use torrent name directly without timestamp
             base_name = torrent_name
 
-            compressor = FileCompressor(progress_message)
+            compressor = FileCompressor(progress_message, job_state)
+            if memory_budget:
+                compressor.threads = memory_budget.compression_threads()
             compressed_file = compressor.compress_folder(download_path, base_name)
 
-            uploader = FileUploader(progress_message)
+            upload_success = False
             if compressed_file:
-                uploader.upload_file(compressed_file, was_compressed=True)
+                upload_success = uploader.upload_file(
+                    compressed_file, was_compressed=True
+                )
             else:
                 files = [
                     f
@@ -746,22 +1798,46 @@ def main():
                 ]
                 if files:
                     file_to_upload = os.path.join(download_path, files[0])
-                    uploader.upload_file(file_to_upload, was_compressed=False)
+                    upload_success = uploader.upload_file(
+                        file_to_upload, was_compressed=False
+                    )
                 else:
                     progress_message.update(
                         "✅ Download Complete!\n" "❌ No files to upload"
                     )
+            upload_state = (job_state.snapshot()["current"] or {}).get("upload") or {}
+            if upload_success:
+                mirror_cache.store(magnet_link, torrent_name, upload_state)
+            memory_monitor.stop()
+            job_state.finish_job(
+                upload_success,
+                download_link=upload_state.get("download_link"),
+                error=None if upload_success else "Upload failed",
+            )
 
     except KeyboardInterrupt:
         logger.info("User interrupted")
         progress_message.update("⚠️ User interrupted")
+        memory_monitor.stop()
+        job_state.finish_job(False, error="User interrupted")
     except Exception as e:
         error_msg = f"Error: {str(e)}"
         logger.error(error_msg, exc_info=True)
         progress_message.update(f"❌ {error_msg}")
+        memory_monitor.stop()
+        job_state.finish_job(False, error=error_msg)
     finally:
         if "downloader" in locals():
             downloader.cleanup()
+        memory_usage = memory_monitor.stop()
+        logger.info(
+            f"Peak RSS: {memory_usage['peak_rss'] / 1048576:.1f} MB, "
+            f"child peak RSS: {memory_usage['children_peak_rss'] / 1048576:.1f} MB"
+        )
+        if status_server:
+            # Give observers a chance to read the final state before exiting
+            time.sleep(max(0, get_env_int("STATUS_LINGER", 10)))
+            status_server.stop()
         logger.info("Script finished")
 
 
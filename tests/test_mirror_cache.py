@@ -0,0 +1,213 @@
+import base64
+import importlib.util
+import json
+import os
+import time
+
+import pytest
+
+pytest.importorskip("libtorrent")
+pytest.importorskip("requests_toolbelt")
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+INFO_HASH = "c12fe1c06bba254a9dc9f519b335aa7c1367a88a"
+MAGNET = f"magnet:?xt=urn:btih:{INFO_HASH}&dn=Some.Release"
+
+
+@pytest.fixture(scope="module")
+def mirror(tmp_path_factory):
+    """Load magnet-to-mirror.py, keeping its log file out of the repo"""
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("logs"))
+    try:
+        spec = importlib.util.spec_from_file_location(
+            "magnet_to_mirror", os.path.join(REPO_ROOT, "magnet-to-mirror.py")
+        )
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        os.chdir(cwd)
+    return module
+
+
+@pytest.fixture
+def uploaded_file(tmp_path):
+    path = tmp_path / "Some.Release.mkv"
+    path.write_bytes(b"x" * 1024)
+    return {
+        "download_link": "https://gofile.io/d/abc123",
+        "file": path.name,
+        "size": 1024,
+        "path": str(path),
+    }
+
+
+class StubValidator:
+    def __init__(self, result):
+        self.result = result
+        self.calls = []
+
+    def __call__(self, link: str):
+        self.calls.append(link)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+def test_cache_key_same_for_hex_and_base32(mirror):
+    b32 = base64.b32encode(bytes.fromhex(INFO_HASH)).decode()
+    hex_key = mirror.MirrorCache.cache_key(MAGNET)
+    b32_key = mirror.MirrorCache.cache_key(f"magnet:?xt=urn:btih:{b32}&dn=Some.Release")
+    assert hex_key == b32_key == f"{INFO_HASH}:*"
+
+
+def test_cache_key_ignores_display_name(mirror):
+    other = f"magnet:?xt=urn:btih:{INFO_HASH.upper()}&dn=Renamed"
+    assert mirror.MirrorCache.cache_key(other) == mirror.MirrorCache.cache_key(MAGNET)
+
+
+def test_cache_key_select_only_order(mirror):
+    first = mirror.MirrorCache.cache_key(f"{MAGNET}&so=0,2,4")
+    second = mirror.MirrorCache.cache_key(f"{MAGNET}&so=4,0,2")
+    assert first == second
+    assert first != mirror.MirrorCache.cache_key(MAGNET)
+
+
+def test_cache_key_prefers_btih_in_hybrid_magnet(mirror):
+    btmh = "1220" + "ab" * 32
+    btih_first = f"magnet:?xt=urn:btih:{INFO_HASH}&xt=urn:btmh:{btmh}"
+    btmh_first = f"magnet:?xt=urn:btmh:{btmh}&xt=urn:btih:{INFO_HASH}"
+    assert mirror.MirrorCache.cache_key(btih_first) == f"{INFO_HASH}:*"
+    assert mirror.MirrorCache.cache_key(btmh_first) == f"{INFO_HASH}:*"
+
+
+def test_lookup_hit_within_ttl(mirror, tmp_path, uploaded_file):
+    validator = StubValidator(mirror.LinkStatus.GONE)
+    cache = mirror.MirrorCache(str(tmp_path / "cache.json"), validator, ttl=3600)
+    cache.store(MAGNET, "Some.Release", uploaded_file)
+
+    entry = cache.lookup(f"magnet:?xt=urn:btih:{INFO_HASH}&dn=Renamed")
+
+    assert entry["links"] == ["https://gofile.io/d/abc123"]
+    assert entry["files"][0]["size"] == 1024
+    assert validator.calls == []
+
+
+def test_lookup_revalidates_after_ttl(mirror, tmp_path, uploaded_file):
+    validator = StubValidator(mirror.LinkStatus.VALID)
+    cache = mirror.MirrorCache(str(tmp_path / "cache.json"), validator, ttl=0)
+    cache.store(MAGNET, "Some.Release", uploaded_file)
+    stored_at = cache.entries[f"{INFO_HASH}:*"]["checked_at"]
+    time.sleep(0.01)
+
+    entry = cache.lookup(MAGNET)
+
+    assert entry is not None
+    assert validator.calls == ["https://gofile.io/d/abc123"]
+    assert entry["checked_at"] > stored_at
+
+
+def test_lookup_drops_entry_when_link_is_gone(mirror, tmp_path, uploaded_file):
+    cache_path = tmp_path / "cache.json"
+    validator = StubValidator(mirror.LinkStatus.GONE)
+    cache = mirror.MirrorCache(str(cache_path), validator, ttl=0)
+    cache.store(MAGNET, "Some.Release", uploaded_file)
+    time.sleep(0.01)
+
+    assert cache.lookup(MAGNET) is None
+    assert json.loads(cache_path.read_text()) == {}
+
+
+@pytest.mark.parametrize("raises", [False, True])
+def test_lookup_keeps_entry_when_check_is_inconclusive(
+    mirror, tmp_path, uploaded_file, raises
+):
+    cache_path = tmp_path / "cache.json"
+    result = RuntimeError("rate limited") if raises else mirror.LinkStatus.UNKNOWN
+    cache = mirror.MirrorCache(str(cache_path), StubValidator(result), ttl=0)
+    cache.store(MAGNET, "Some.Release", uploaded_file)
+    stored_at = cache.entries[f"{INFO_HASH}:*"]["checked_at"]
+    time.sleep(0.01)
+
+    entry = cache.lookup(MAGNET)
+
+    assert entry["links"] == ["https://gofile.io/d/abc123"]
+    saved = json.loads(cache_path.read_text())[f"{INFO_HASH}:*"]
+    assert saved["checked_at"] == stored_at
+
+
+def test_corrupt_cache_file_starts_empty(mirror, tmp_path, uploaded_file):
+    cache_path = tmp_path / "cache.json"
+    cache_path.write_text("{not json")
+
+    cache = mirror.MirrorCache(str(cache_path), StubValidator(mirror.LinkStatus.VALID))
+    assert cache.lookup(MAGNET) is None
+
+    cache.store(MAGNET, "Some.Release", uploaded_file)
+    assert cache.lookup(MAGNET) is not None
+
+
+def test_store_keeps_entries_from_other_jobs(mirror, tmp_path, uploaded_file):
+    cache_path = str(tmp_path / "cache.json")
+    first = mirror.MirrorCache(cache_path, StubValidator(mirror.LinkStatus.VALID))
+    second = mirror.MirrorCache(cache_path, StubValidator(mirror.LinkStatus.VALID))
+    other_magnet = f"magnet:?xt=urn:btih:{'0' * 40}&dn=Other"
+
+    first.store(MAGNET, "Some.Release", uploaded_file)
+    second.store(other_magnet, "Other", uploaded_file)
+
+    with open(cache_path) as f:
+        assert set(json.load(f)) == {f"{INFO_HASH}:*", f"{'0' * 40}:*"}
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_store_skips_missing_file(mirror, tmp_path, uploaded_file):
+    cache_path = tmp_path / "cache.json"
+    cache = mirror.MirrorCache(str(cache_path), StubValidator(mirror.LinkStatus.VALID))
+    uploaded_file["path"] = str(tmp_path / "missing.mkv")
+
+    cache.store(MAGNET, "Some.Release", uploaded_file)
+
+    assert cache.lookup(MAGNET) is None
+    assert not cache_path.exists()
+
+
+class StubResponse:
+    def __init__(self, payload: dict):
+        self.payload = payload
+
+    def json(self) -> dict:
+        return self.payload
+
+
+@pytest.mark.parametrize(
+    "status, expected",
+    [("ok", "VALID"), ("error-notFound", "GONE"), ("error-notPremium", "UNKNOWN")],
+)
+def test_check_link_uses_content_api(mirror, monkeypatch, status, expected):
+    requested = []
+
+    def fake_get(url, headers, timeout):
+        requested.append((url, headers["Authorization"]))
+        return StubResponse({"status": status, "data": {}})
+
+    monkeypatch.setattr(mirror.requests, "get", fake_get)
+    uploader = mirror.FileUploader(progress_message=None)
+    uploader.api_token = "token"
+
+    result = uploader.check_link("https://gofile.io/d/abc123")
+    assert result is mirror.LinkStatus[expected]
+    assert requested == [("https://api.gofile.io/contents/abc123", "Bearer token")]
+
+
+def test_check_link_unknown_on_network_error(mirror, monkeypatch):
+    def fake_get(url, headers, timeout):
+        raise mirror.requests.exceptions.ConnectionError("connection reset")
+
+    monkeypatch.setattr(mirror.requests, "get", fake_get)
+    uploader = mirror.FileUploader(progress_message=None)
+    uploader.api_token = "token"
+
+    result = uploader.check_link("https://gofile.io/d/abc123")
+    assert result is mirror.LinkStatus.UNKNOWN